@@ -2,6 +2,7 @@
 
 import os
 import json
+import hashlib
 import argparse
 import numpy as np
 import xgboost as xgb
@@ -91,19 +92,86 @@ def run_training(labeled_data_path, model_output_path):
         'label_mapping': LABEL_MAPPING,
         'feature_names': feature_extractor.feature_names
     }
+    # Also export an ONNX copy next to the bundle; predict.py uses it when onnxruntime is installed.
+    # The bundle records the file's hash so that a stale export is never paired with this model.
+    onnx_output_path = os.path.splitext(model_output_path)[0] + '.onnx'
+    _set_onnx_record(model_bundle, model_output_path, onnx_output_path,
+                     export_onnx_model(model, feature_matrix.shape[1], onnx_output_path))
+
     joblib.dump(model_bundle, model_output_path)
     print(f"Training complete. Model bundle saved to: {model_output_path}")
 
+def export_onnx_model(model, num_features, onnx_output_path):
+    """
+    Phase 3 (optional): Converts a trained XGBoost classifier to ONNX so that prediction
+    can run through ONNX Runtime instead of the Python XGBoost wrapper.
+    Returns the SHA-256 of the written file, or None if the export was skipped or failed,
+    in which case any older file at `onnx_output_path` is removed.
+    """
+    try:
+        import onnxmltools
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        onnx_bytes = onnxmltools.convert_xgboost(
+            model, initial_types=[('input', FloatTensorType([None, num_features]))]
+        ).SerializeToString()
+    except ImportError:
+        print("Skipping ONNX export: 'onnxmltools' is not installed.")
+        _remove_stale_onnx(onnx_output_path)
+        return None
+    except Exception as e:
+        print(f"WARNING: ONNX export failed, predictions will use the joblib model. Error: {e}")
+        _remove_stale_onnx(onnx_output_path)
+        return None
+
+    output_dir = os.path.dirname(onnx_output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(onnx_output_path, 'wb') as f:
+        f.write(onnx_bytes)
+    print(f"ONNX model saved to: {onnx_output_path}")
+    return hashlib.sha256(onnx_bytes).hexdigest()
+
+def _remove_stale_onnx(onnx_output_path):
+    if os.path.exists(onnx_output_path):
+        os.remove(onnx_output_path)
+        print(f"Removed stale ONNX model: {onnx_output_path}")
+
+def _set_onnx_record(model_bundle, model_bundle_path, onnx_output_path, onnx_sha256):
+    """
+    Records which ONNX file belongs to the bundle (path relative to the bundle, plus its hash).
+    """
+    if onnx_sha256 is None:
+        model_bundle.pop('onnx_model', None)
+        return
+    bundle_dir = os.path.dirname(os.path.abspath(model_bundle_path))
+    model_bundle['onnx_model'] = {
+        'file': os.path.relpath(os.path.abspath(onnx_output_path), bundle_dir),
+        'sha256': onnx_sha256
+    }
+
+def run_onnx_export(model_bundle_path, onnx_output_path):
+    """
+    Exports the model of an existing bundle to ONNX without re-training it,
+    and re-saves the bundle with a record of the new ONNX file.
+    """
+    print(f"--- Running ONNX Export ---")
+    model_bundle = joblib.load(model_bundle_path)
+    onnx_sha256 = export_onnx_model(model_bundle['model'], len(model_bundle['feature_names']), onnx_output_path)
+    _set_onnx_record(model_bundle, model_bundle_path, onnx_output_path, onnx_sha256)
+    joblib.dump(model_bundle, model_bundle_path)
+    print(f"Model bundle updated: {model_bundle_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="PDF Outline Extraction Pipeline")
-    parser.add_argument('phase', choices=['extract', 'train'], help="The pipeline phase to run.")
-    parser.add_argument('--input', required=True, help="Input file (for extract) or directory (for train).")
-    parser.add_argument('--output', required=True, help="Output file path for the generated data or model.")
+    parser.add_argument('phase', choices=['extract', 'train', 'export'], help="The pipeline phase to run.")
+    parser.add_argument('--input', required=True, help="Input file (for extract), directory (for train) or model bundle (for export).")
+    parser.add_argument('--output', required=True, help="Output file path for the generated data, model or ONNX model.")
     
     args = parser.parse_args()
 
     if args.phase == 'extract':
         run_extraction(args.input, args.output)
     elif args.phase == 'train':
-        run_training(args.input, args.output)
\ No newline at end of file
+        run_training(args.input, args.output)
+    elif args.phase == 'export':
+        run_onnx_export(args.input, args.output)
\ No newline at end of file
@@ -1,82 +1,176 @@
 # Filename: predict.py (UPGRADED with Advanced Heuristics)
 
 import os
-import json
+import sys
+import hashlib
 import argparse
 import joblib
+import orjson
 import numpy as np
 import re
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple
 from utils.pdf_extractor import PdfExtractor
 from utils.feature_extractor_lite import FeatureExtractorLite
+from utils.score_blocks import score_block_labels
 
-def apply_advanced_rules(block: Dict[str, Any], predicted_label: str, median_font: float) -> str:
+# ONNX Runtime is optional. When it is installed and the bundle records an exported
+# ONNX model (see `main.py export`), inference runs through it instead.
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# Hyperscan is optional. When installed, the strong-negative filter patterns of
+# _get_strong_negative_mask are matched together in one pass over each block's text.
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# ONNX sessions can't be pickled into the bundle, so each process keeps its own.
+_ONNX_SESSIONS = {}
+_ONNX_SESSIONS_LOCK = threading.Lock()
+
+# --- Pre-compiled patterns used by the heuristic rules (compiled once at import) ---
+_TOC_DOTS_RE = re.compile(r'\.{3,}\s*\d+\s*$')
+_TRAIL_NUM_RE = re.compile(r'\s+\d+\s*$')
+_NUM_HEAD_RE = re.compile(r'^\d+\.\s+')
+_H2_RE = re.compile(r'^[1-9]\d*\.[1-9]\d*\.\s+')
+_VERSION_RE = re.compile(r'Version\s?[\d\.]+|[\d\w\s,]+20\d{2}', re.IGNORECASE)
+_NUMWS_RE = re.compile(r'[\d\W\s]+')
+# A word starting with a lowercase letter can never be title-cased or upper-cased
+_LOWERCASE_WORD_RE = re.compile(r'(?:^|\s)[a-z]')
+
+# Bit flags reported by _scan_rule_patterns, one per strong-negative filter pattern
+_TOC_DOTS = 1 << 0
+_TRAIL_NUM = 1 << 1
+_NUM_HEAD = 1 << 2
+_LOWERCASE_WORD = 1 << 3
+_VERSION = 1 << 4
+
+def _build_hyperscan_db():
     """
-    Applies a much more robust set of rules to eliminate common false positives
-    like TOC entries, footers, and table headers.
+    Compiles the filter patterns into one Hyperscan database. Pattern ids are the bit positions above.
     """
-    text = block['text'].strip()
-    if not text:
-        return 'NONE'
+    expressions = [
+        _TOC_DOTS_RE.pattern, _TRAIL_NUM_RE.pattern, _NUM_HEAD_RE.pattern, _LOWERCASE_WORD_RE.pattern,
+        f'^(?:{_VERSION_RE.pattern})$',  # used with fullmatch()
+    ]
+    base_flags = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+    flags = [base_flags] * 4 + [base_flags | hyperscan.HS_FLAG_CASELESS]
+
+    db = hyperscan.Database()
+    db.compile(expressions=[e.encode('utf-8') for e in expressions], ids=list(range(len(expressions))),
+               elements=len(expressions), flags=flags)
+    return db
 
-    # --- STRONG NEGATIVE FILTERS (Early Exit) ---
-    # These patterns are almost never headings.
+_HS_DB = _build_hyperscan_db() if hyperscan is not None else None
+# A Hyperscan scratch space can only be used by one scan at a time, so each thread gets its own.
+_HS_LOCAL = threading.local()
+
+def _get_hyperscan_scratch():
+    scratch = getattr(_HS_LOCAL, 'scratch', None)
+    if scratch is None:
+        scratch = _HS_LOCAL.scratch = hyperscan.Scratch(_HS_DB)
+    return scratch
+
+def _on_hyperscan_match(pattern_id, start, end, flags, hits):
+    hits[0] |= 1 << pattern_id
+
+def _scan_rule_patterns(text: str) -> int:
+    """
+    Returns a bitmask of the filter patterns that match the (stripped, non-empty) text.
+    Without Hyperscan each compiled pattern runs only if a cheap character check says it can match.
+    """
+    if _HS_DB is not None:
+        try:
+            hits = [0]
+            _HS_DB.scan(text.encode('utf-8'), match_event_handler=_on_hyperscan_match, context=hits,
+                        scratch=_get_hyperscan_scratch())
+            return hits[0]
+        except UnicodeEncodeError:
+            pass  # e.g. lone surrogates from a broken PDF text layer; fall back to `re`
+
+    hits = 0
+    # The TOC, page-number and date patterns can only match text that ends in a digit.
+    tail_is_digit = text[-1].isdigit()
+    if tail_is_digit:
+        if _TOC_DOTS_RE.search(text):
+            hits |= _TOC_DOTS
+        if _TRAIL_NUM_RE.search(text):
+            hits |= _TRAIL_NUM
+            if _NUM_HEAD_RE.match(text):
+                hits |= _NUM_HEAD
+    # Both version/date alternatives either start with "Version" or end with a year.
+    if (tail_is_digit or text[0] in 'vV') and _VERSION_RE.fullmatch(text):
+        hits |= _VERSION
+    if _LOWERCASE_WORD_RE.search(text):
+        hits |= _LOWERCASE_WORD
+    return hits
+
+def _get_block_arrays(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Gathers the block fields used by the heuristic rules into parallel arrays (one entry per block)
+    so that the rules can be evaluated for the whole document at once.
+    """
+    n = len(blocks)
+    texts = [b['text'].strip() for b in blocks]
+    return {
+        'text': texts,
+        'text_len': np.fromiter((len(t) for t in texts), dtype=np.int64, count=n),
+        'word_count': np.fromiter((len(t.split()) for t in texts), dtype=np.int64, count=n),
+        'font_size': np.fromiter((b.get('font_size', 0) for b in blocks), dtype=np.float64, count=n),
+        'is_bold': np.fromiter((b.get('is_bold', False) for b in blocks), dtype=bool, count=n),
+        'space_before': np.fromiter((b.get('vertical_space_before', 0) for b in blocks), dtype=np.float64, count=n),
+        'y1': np.fromiter((b['bbox']['y1'] for b in blocks), dtype=np.float64, count=n),
+        'page_height': np.fromiter((b.get('page_height', 792) for b in blocks), dtype=np.float64, count=n),
+        'page_number': np.fromiter((b['page_number'] for b in blocks), dtype=np.int64, count=n),
+        'ends_punct': np.fromiter((t[-1:] in ('.', ':', ';') for t in texts), dtype=bool, count=n),
+        # "1.2. Scope" style numbering makes a promoted heading an H2 rather than an H1
+        'is_h2_numbered': np.fromiter((t[:1].isdigit() and _H2_RE.match(t) is not None for t in texts), dtype=bool, count=n),
+    }
+
+def _get_strong_negative_mask(block_arrays: Dict[str, Any], median_font: float, size_thresholds: Tuple[float, float, float]) -> np.ndarray:
+    """
+    Returns a boolean mask of the blocks that can never be headings, whatever the model predicts:
+    empty text, TOC entries, footers/headers, table headers and title-page version/date lines.
+    `size_thresholds` is (1.1, 1.15, 1.25) x median_font, precomputed once per document.
+    """
+    texts = block_arrays['text']
+    font_size = block_arrays['font_size']
+    word_count = block_arrays['word_count']
+    hits = np.fromiter((_scan_rule_patterns(t) if t else 0 for t in texts), dtype=np.int64, count=len(texts))
+
+    # 0. Blocks with no text at all.
+    mask = block_arrays['text_len'] == 0
 
     # 1. Filter out Table of Contents (TOC) entries.
     # Pattern: text ending with ...... 123 or a page number.
-    if re.search(r'\.{3,}\s*\d+\s*$', text):
-        return 'NONE'
-    # Pattern: A heading candidate followed by just a number at the end of the line.
-    if len(text.split()) > 2 and re.search(r'\s+\d+\s*$', text):
-         # Exclude if it's a genuine numbered heading like "1. Introduction"
-        if not re.match(r'^\d+\.\s+', text):
-            return 'NONE'
+    mask |= (hits & _TOC_DOTS) != 0
+    # Pattern: A heading candidate followed by just a number at the end of the line,
+    # unless it's a genuine numbered heading like "1. Introduction"
+    mask |= (word_count > 2) & ((hits & _TRAIL_NUM) != 0) & ((hits & _NUM_HEAD) == 0)
 
     # 2. Filter out footer/header text.
     # Text at the very top or bottom of the page with a small font is likely a header/footer.
-    y_pos_normalized = block['bbox']['y1'] / block.get('page_height', 792)
-    if (y_pos_normalized > 0.9 or y_pos_normalized < 0.1) and block['font_size'] <= median_font:
-        return 'NONE'
+    y_pos_normalized = block_arrays['y1'] / block_arrays['page_height']
+    mask |= ((y_pos_normalized > 0.9) | (y_pos_normalized < 0.1)) & (font_size <= median_font)
 
     # 3. Filter out table headers or other non-heading metadata.
     # Example: "Version Date Remarks". More than 2 words, title-cased, but not a sentence.
-    words = text.split()
-    if len(words) > 2 and all(word.istitle() or word.isupper() for word in words) and block['font_size'] < median_font * 1.1:
-         # This is likely a table header, not a section heading.
-         return 'NONE'
-    
+    # Any lowercase-initial word rules a line out, so the per-word istitle()/isupper()
+    # check only runs for the few lines left over.
+    table_candidates = (font_size < size_thresholds[0]) & (word_count > 2) & ((hits & _LOWERCASE_WORD) == 0) & ~mask
+    for i in np.flatnonzero(table_candidates):
+        if all(word.istitle() or word.isupper() for word in texts[i].split()):
+            # This is likely a table header, not a section heading.
+            mask[i] = True
+
     # 4. Filter out simple version numbers or dates on the title page.
-    if block['page_number'] == 1 and re.fullmatch(r'Version\s?[\d\.]+|[\d\w\s,]+20\d{2}', text, re.IGNORECASE):
-        return 'NONE'
-
-
-    # --- HEADING SCORING SYSTEM (from previous version, but now applied to filtered blocks) ---
-    heading_score = 0
-    font_size = block.get('font_size', 0)
-    is_bold = block.get('is_bold', False)
-    space_before = block.get('vertical_space_before', 0)
-    relative_size = font_size / median_font if median_font > 0 else 1.0
-
-    if is_bold: heading_score += 2
-    if relative_size > 1.25: heading_score += 3
-    elif relative_size > 1.15: heading_score += 2
-    if space_before > font_size * 1.5: heading_score += 2
-    if len(text) > 150: heading_score -= 3
-    if text.endswith(('.', ':', ';')): heading_score -= 2
-
-    # --- DECISION LOGIC ---
-    if predicted_label.startswith('H') and heading_score < 1:
-        return 'NONE'
-    if predicted_label == 'NONE' and heading_score >= 4:
-        if re.match(r'^[1-9]\d*\.[1-9]\d*\.\s+', text): return 'H2'
-        if re.match(r'^[1-9]\d*\.\s+', text): return 'H1'
-        return 'H1'
-
-    # Rule: A TITLE can ONLY be on page 1.
-    if predicted_label == 'TITLE' and block['page_number'] != 1:
-        return 'H1'
-
-    return predicted_label
+    mask |= (block_arrays['page_number'] == 1) & ((hits & _VERSION) != 0)
+
+    return mask
 
 def structure_final_output(labeled_blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
@@ -85,47 +179,51 @@ def structure_final_output(labeled_blocks: List[Dict[str, Any]]) -> Dict[str, An
     """
     title = "Untitled Document"
     outline = []
-    title_block_indices = []
+    title_block_indices = set()
 
     # Heuristic to find the title: Find the block with the largest font on page 1.
-    page1_blocks = [b for b in labeled_blocks if b.get('page_number') == 1]
+    # Keep track of original index
+    page1_blocks_with_indices = [(block, i) for i, block in enumerate(labeled_blocks) if block.get('page_number') == 1]
     
-    if page1_blocks:
-        def sort_key(b):
-            text = b[0]['text'].strip() # b is now (block, index)
-            if re.fullmatch(r'[\d\W\s]+', text) or len(text) < 4 or text.lower() == 'copyright':
-                return 0
-            return b[0].get('font_size', 0)
-
-        # Keep track of original index
-        page1_blocks_with_indices = [(block, i) for i, block in enumerate(labeled_blocks) if block.get('page_number') == 1]
+    if page1_blocks_with_indices:
+        # Score every candidate at once: its font size, or 0 for junk such as page
+        # numbers, very short fragments or a "copyright" line.
+        stripped_texts = [block['text'].strip() for block, _ in page1_blocks_with_indices]
+        scores = np.fromiter((block.get('font_size', 0) for block, _ in page1_blocks_with_indices),
+                             dtype=np.float64, count=len(page1_blocks_with_indices))
+        is_junk = np.fromiter(
+            (len(text) < 4 or text.lower() == 'copyright' or _NUMWS_RE.fullmatch(text) is not None for text in stripped_texts),
+            dtype=bool, count=len(stripped_texts)
+        )
+        scores[is_junk] = 0
+
+        # The highest score wins; ties go to the earliest block in reading order
+        title_block, title_start_index = page1_blocks_with_indices[int(np.argmax(scores))]
+        title_parts = [title_block['text']]
+        title_block_indices.add(title_start_index)
         
-        if page1_blocks_with_indices:
-            page1_blocks_with_indices.sort(key=sort_key, reverse=True)
+        # ** NEW: Attempt to merge subsequent lines into the title **
+        # Continuation lines directly follow the title in reading order, so only the
+        # next few blocks on page 1 are candidates.
+        last_title_block = title_block
+        for next_block_index in range(title_start_index + 1, min(title_start_index + 8, len(labeled_blocks))):
+            next_block = labeled_blocks[next_block_index]
+            if next_block.get('page_number') != 1:
+                break
             
-            # Start with the highest-scored block as the first line of the title
-            title_block, title_start_index = page1_blocks_with_indices[0]
-            title_parts = [title_block['text']]
-            title_block_indices.append(title_start_index)
+            # Condition: is the next block stylistically similar and vertically close?
+            is_similar_font = abs(next_block['font_size'] - last_title_block['font_size']) < 1.0
+            is_close_vertically = (next_block['bbox']['y0'] - last_title_block['bbox']['y1']) < last_title_block['font_size']
             
-            # ** NEW: Attempt to merge subsequent lines into the title **
-            last_title_block = title_block
-            for i in range(page1_blocks_with_indices.index((title_block, title_start_index)) + 1, len(page1_blocks_with_indices)):
-                next_block, next_block_index = page1_blocks_with_indices[i]
-                
-                # Condition: is the next block stylistically similar and vertically close?
-                is_similar_font = abs(next_block['font_size'] - last_title_block['font_size']) < 1.0
-                is_close_vertically = (next_block['bbox']['y0'] - last_title_block['bbox']['y1']) < last_title_block['font_size']
-                
-                if is_similar_font and is_close_vertically:
-                    title_parts.append(next_block['text'])
-                    title_block_indices.append(next_block_index)
-                    last_title_block = next_block
-                else:
-                    # The title block sequence is broken
-                    break
-            
-            title = " ".join(title_parts)
+            if is_similar_font and is_close_vertically:
+                title_parts.append(next_block['text'])
+                title_block_indices.add(next_block_index)
+                last_title_block = next_block
+            else:
+                # The title block sequence is broken
+                break
+        
+        title = " ".join(title_parts)
 
 
     # Build the outline from all blocks that are headings AND were not used in the title
@@ -145,22 +243,115 @@ def structure_final_output(labeled_blocks: List[Dict[str, Any]]) -> Dict[str, An
     return {"title": title.strip(), "outline": outline}
 
 
-def predict_outline(pdf_path, model_path, output_path=None):
+def _get_heading_contexts(blocks: List[Dict[str, Any]], labels: List[str], median_font: float) -> List[Dict[str, Any]]:
     """
-    Loads a model, predicts labels sequentially, applies advanced rules, and structures the output.
+    Returns, for every block, the 'last heading' context that precedes it given a full list of labels.
+    """
+    last_heading_info = {'index': -1, 'level': 0, 'font_size': median_font}
+    heading_contexts = []
+
+    for i, (block, label) in enumerate(zip(blocks, labels)):
+        heading_contexts.append(last_heading_info)
+
+        if label.startswith('H'):
+            try:
+                level = int(label[1:])
+                last_heading_info = {'index': i, 'level': level, 'font_size': block.get('font_size', median_font)}
+            except (ValueError, IndexError):
+                pass
+        elif label == 'TITLE':
+            last_heading_info = {'index': i, 'level': 0, 'font_size': block.get('font_size', median_font)}
+
+    return heading_contexts
+
+
+def load_model(model_path: str) -> Dict[str, Any]:
+    """
+    Loads the model bundle saved by the training phase. Returns None if it cannot be loaded.
+    If the bundle records an ONNX export of its model and that file is unchanged, its path is added to the bundle.
     """
-    print(f"--- Running Prediction Phase (Hybrid ML + Advanced Heuristics) ---")
-    
-    # Steps 1 & 2: Load Model and Extract Blocks (Unchanged)
     print(f"Loading model bundle from: {model_path}...")
     try:
         model_bundle = joblib.load(model_path)
-        model = model_bundle['model']
-        inverse_label_map = {v: k for k, v in model_bundle['label_mapping'].items()}
     except Exception as e:
         print(f"FATAL ERROR: Could not load model bundle. Error: {e}")
+        return None
+
+    onnx_record = model_bundle.get('onnx_model')
+    if ort is not None and onnx_record:
+        onnx_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), onnx_record['file'])
+        if _file_sha256(onnx_path) == onnx_record['sha256']:
+            print(f"Using ONNX Runtime model: {onnx_path}")
+            model_bundle['onnx_path'] = onnx_path
+        else:
+            print(f"Warning: Ignoring ONNX model '{onnx_path}': it is missing or was not exported from this bundle.")
+
+    return model_bundle
+
+
+def _file_sha256(path: str):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _get_onnx_session(onnx_path: str):
+    with _ONNX_SESSIONS_LOCK:
+        if onnx_path not in _ONNX_SESSIONS:
+            _ONNX_SESSIONS[onnx_path] = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        return _ONNX_SESSIONS[onnx_path]
+
+
+def _predict_label_ints(model_bundle: Dict[str, Any], features: np.ndarray) -> np.ndarray:
+    """
+    Predicts integer labels for a (N, F) float32 feature matrix with the fastest available backend.
+    """
+    onnx_path = model_bundle.get('onnx_path')
+    if onnx_path:
+        session = _get_onnx_session(onnx_path)
+        return session.run(None, {session.get_inputs()[0].name: features})[0]
+
+    model = model_bundle['model']
+    if hasattr(model, 'get_booster') and model.get_params().get('objective') in ('multi:softmax', 'multi:softprob'):
+        # XGBoost multiclass: call the native booster directly and skip the sklearn wrapper's per-call
+        # input validation, keeping its `missing` value and best-iteration cutoff.
+        # multi:softmax yields class ids, multi:softprob a probability matrix.
+        try:
+            iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            iteration_range = (0, 0)
+        raw_predictions = model.get_booster().inplace_predict(
+            features, missing=model.missing, iteration_range=iteration_range
+        )
+        class_ids = raw_predictions.argmax(axis=1) if raw_predictions.ndim == 2 else raw_predictions.astype(np.int64)
+        return model.classes_[class_ids]
+    return model.predict(features)
+
+
+def predict_outline(pdf_path, model_path, output_path=None):
+    """
+    Loads a model, predicts labels in batches, applies advanced rules, and structures the output.
+    """
+    model_bundle = load_model(model_path)
+    if model_bundle is None:
         return
 
+    predict_outline_with_bundle(pdf_path, model_bundle, output_path)
+
+
+def predict_outline_with_bundle(pdf_path, model_bundle, output_path=None):
+    """
+    Same as predict_outline, but with an already loaded model bundle so that
+    batch callers only deserialize the model once.
+    """
+    print(f"--- Running Prediction Phase (Hybrid ML + Advanced Heuristics) ---")
+
+    # Steps 1 & 2: Unpack Model and Extract Blocks
+    label_codes = model_bundle['label_mapping']
+    inverse_label_map = {v: k for k, v in label_codes.items()}
+
     print(f"Extracting and processing blocks from: {pdf_path}...")
     pdf_extractor = PdfExtractor()
     blocks = pdf_extractor.extract_enriched_blocks(pdf_path)
@@ -168,57 +359,81 @@ def predict_outline(pdf_path, model_path, output_path=None):
         print("Warning: No text blocks were found.")
         return
 
-    # Step 3: Sequential Prediction with Advanced Rules (Main Change Here)
+    # Step 3: Batched Prediction with Advanced Rules (Main Change Here)
     print("Generating features and predicting labels with advanced rules...")
     feature_extractor = FeatureExtractorLite()
     
-    font_map = feature_extractor._get_font_mapping(blocks)
-    lang_map = feature_extractor._get_language_mapping(blocks)
-    doc_font_sizes = [b.get('font_size', 0) for b in blocks if b.get('font_size', 0) > 6]
-    median_font = np.median(doc_font_sizes) if doc_font_sizes else 12.0
+    median_font, font_map, lang_map = feature_extractor._get_document_stats(blocks)
+    size_thresholds = (median_font * 1.1, median_font * 1.15, median_font * 1.25)
 
-    last_heading_info = {'index': -1, 'level': 0, 'font_size': median_font}
-    all_labeled_blocks = []
+    # The strong negative filters don't depend on the model, so evaluate them once for the whole document
+    block_arrays = _get_block_arrays(blocks)
+    rejected = _get_strong_negative_mask(block_arrays, median_font, size_thresholds)
 
+    # The last three features describe the most recent heading, which is only known
+    # once the preceding blocks are labeled. Instead of predicting one row at a time,
+    # predict the whole batch with the current best guess of that context, rebuild the
+    # context from the resulting labels and re-predict from the first block whose
+    # context changed. Labels before that block can no longer change, so this reaches
+    # exactly the sequential result, usually within a few batches.
+    # All rows live in one preallocated buffer; after the first batch only the
+    # context columns of rows whose context changed are rewritten in place.
+    num_features = len(feature_extractor.feature_names)
+    num_context = feature_extractor.NUM_CONTEXT_FEATURES
+    features = np.empty((len(blocks), num_features), dtype=np.float32)
+    heading_contexts = [{'index': -1, 'level': 0, 'font_size': median_font}] * len(blocks)
     for i, block in enumerate(blocks):
-        current_features_list = feature_extractor._get_block_features(
-            block, i, median_font, font_map, lang_map, last_heading_info
+        features[i, :] = feature_extractor._get_block_features(
+            block, i, median_font, font_map, lang_map, heading_contexts[i]
         )
-        current_features_np = np.array([current_features_list], dtype=np.float32)
 
-        predicted_label_int = model.predict(current_features_np)[0]
-        initial_label = inverse_label_map.get(predicted_label_int, 'NONE')
-        
-        # Apply the NEW, more advanced rules
-        final_label = apply_advanced_rules(block, initial_label, median_font)
-        
+    final_labels = []
+    start = 0
+
+    while start < len(blocks):
+        predicted_label_ints = _predict_label_ints(model_bundle, features[start:])
+
+        # Apply the NEW, more advanced rules to the whole batch at once
+        final_label_codes = score_block_labels(block_arrays, rejected, predicted_label_ints, label_codes, size_thresholds, start)
+        final_labels[start:] = [inverse_label_map[code] for code in final_label_codes]
+
+        new_contexts = _get_heading_contexts(blocks, final_labels, median_font)
+        next_start = len(blocks)
+        for i in range(start + 1, len(blocks)):
+            if new_contexts[i] != heading_contexts[i]:
+                next_start = min(next_start, i)
+                features[i, -num_context:] = feature_extractor._get_context_features(blocks[i], i, median_font, new_contexts[i])
+        start = next_start
+        heading_contexts = new_contexts
+
+    all_labeled_blocks = []
+    for block, final_label in zip(blocks, final_labels):
         block['final_label'] = final_label
         all_labeled_blocks.append(block)
 
-        if final_label.startswith('H'):
-            try:
-                level = int(final_label[1:])
-                last_heading_info = {'index': i, 'level': level, 'font_size': block.get('font_size', median_font)}
-            except (ValueError, IndexError):
-                pass
-        elif final_label == 'TITLE':
-            last_heading_info = {'index': i, 'level': 0, 'font_size': block.get('font_size', median_font)}
-
     # Steps 4 & 5: Structure Output and Save (Unchanged, but uses new structuring function)
     print("Structuring the final outline...")
     final_output = structure_final_output(all_labeled_blocks)
-    output_json_string = json.dumps(final_output, indent=4, ensure_ascii=False)
+    # orjson serializes straight to UTF-8 bytes (non-ASCII text is kept as-is). Both branches
+    # write those bytes directly, so the outline is never also held as a decoded str.
+    output_json_bytes = orjson.dumps(final_output, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
 
     if output_path:
         output_dir = os.path.dirname(output_path)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(output_json_string)
+        with open(output_path, 'wb') as f:
+            f.write(output_json_bytes)
         print(f"\n✅ Structured outline saved successfully to: {output_path}")
     else:
-        print("\n--- Generated Structured JSON Outline ---")
-        print(output_json_string)
+        print("\n--- Generated Structured JSON Outline ---", flush=True)
+        stdout_buffer = getattr(sys.stdout, 'buffer', None)
+        if stdout_buffer is not None:
+            stdout_buffer.write(output_json_bytes)
+            stdout_buffer.flush()
+        else:
+            # e.g. stdout replaced by a text-only stream
+            sys.stdout.write(output_json_bytes.decode('utf-8'))
 
 
 if __name__ == "__main__":
@@ -2,13 +2,40 @@
 
 import os
 import argparse
+from joblib import Parallel, delayed
 # You must have 'predict.py' in the same directory for this import to work
-from predict import predict_outline
+from predict import load_model, predict_outline_with_bundle
 
-def process_directory(input_dir, output_dir, model_path):
+def _process_single_pdf(input_dir, output_dir, model_bundle, pdf_filename):
+    """
+    Processes one PDF from the input directory. Errors are logged and swallowed so
+    a single bad file does not abort the rest of the batch.
+    """
+    input_pdf_path = os.path.join(input_dir, pdf_filename)
+
+    base_filename = os.path.splitext(pdf_filename)[0]
+    output_json_filename = f"{base_filename}.json"
+    output_json_path = os.path.join(output_dir, output_json_filename)
+
+    print(f"--- Processing: {pdf_filename} ---")
+
+    try:
+        # Call the function from predict.py
+        predict_outline_with_bundle(
+            pdf_path=input_pdf_path,
+            model_bundle=model_bundle,
+            output_path=output_json_path
+        )
+    except Exception as e:
+        print(f"❌ An error occurred while processing {pdf_filename}: {e}")
+
+
+def process_directory(input_dir, output_dir, model_path, use_threads=False):
     """
     Processes all PDF files in a given directory, and saves the
     structured JSON output to a corresponding output directory.
+    With use_threads=True the PDFs are processed by threads that share the one
+    in-memory model bundle instead of by worker processes that each receive a copy.
     """
     print(f"--- Starting Batch Processing ---")
     print(f"Input PDF Directory: {input_dir}")
@@ -31,26 +58,19 @@ def process_directory(input_dir, output_dir, model_path):
 
     print(f"\nFound {len(pdf_files)} PDF(s) to process: {pdf_files}\n")
 
-    # Loop through each PDF file and process it
-    for pdf_filename in pdf_files:
-        input_pdf_path = os.path.join(input_dir, pdf_filename)
-        
-        base_filename = os.path.splitext(pdf_filename)[0]
-        output_json_filename = f"{base_filename}.json"
-        output_json_path = os.path.join(output_dir, output_json_filename)
-
-        print(f"--- Processing: {pdf_filename} ---")
-
-        try:
-            # Call the function from predict.py
-            predict_outline(
-                pdf_path=input_pdf_path,
-                model_path=model_path,
-                output_path=output_json_path
-            )
-        except Exception as e:
-            print(f"❌ An error occurred while processing {pdf_filename}: {e}")
-            continue
+    # Load the model once and share it with every worker instead of reloading it per PDF
+    model_bundle = load_model(model_path)
+    if model_bundle is None:
+        return
+
+    # Each PDF is independent, so process them in parallel across all CPU cores.
+    # Processes are the default: PDF parsing (PyMuPDF) and language detection hold the GIL,
+    # so threads only overlap the model inference, which does release it.
+    backend = 'threading' if use_threads else 'loky'
+    Parallel(n_jobs=os.cpu_count(), backend=backend, batch_size='auto', verbose=5)(
+        delayed(_process_single_pdf)(input_dir, output_dir, model_bundle, pdf_filename)
+        for pdf_filename in pdf_files
+    )
 
     print("\n--- Batch Processing Complete ---")
 
@@ -62,8 +82,9 @@ if __name__ == "__main__":
     parser.add_argument('--input_dir', required=True, help="Full path to the directory containing the PDF files.")
     parser.add_argument('--output_dir', required=True, help="Full path to the directory where output JSON files will be saved.")
     parser.add_argument('--model', required=True, help="Path to the saved model bundle (.joblib).")
+    parser.add_argument('--threads', action='store_true', help="Optional. Use threads sharing one model instead of worker processes.")
 
     args = parser.parse_args()
 
     # Run the main processing function
-    process_directory(args.input_dir, args.output_dir, args.model)
\ No newline at end of file
+    process_directory(args.input_dir, args.output_dir, args.model, use_threads=args.threads)
\ No newline at end of file
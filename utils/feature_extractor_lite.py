@@ -19,23 +19,30 @@ class FeatureExtractorLite:
             'last_heading_level', 'distance_from_last_heading', 'font_size_vs_last_heading'
         ]
 
-    def _get_font_mapping(self, all_blocks: List[Dict[str, Any]]) -> Dict[str, int]:
-        unique_fonts = sorted(list(set(b.get('font_name', 'default') for b in all_blocks)))
-        return {font_name: i for i, font_name in enumerate(unique_fonts)}
+    def _get_document_stats(self, all_blocks: List[Dict[str, Any]]) -> Tuple[float, Dict[str, int], Dict[str, int]]:
+        """
+        Computes the median body font size and the font / language id mappings in a single pass over the blocks.
+        """
+        doc_font_sizes = []
+        unique_fonts, unique_langs = set(), set()
+        for b in all_blocks:
+            font_size = b.get('font_size', 0)
+            if font_size > 6:
+                doc_font_sizes.append(font_size)
+            unique_fonts.add(b.get('font_name', 'default'))
+            unique_langs.add(b.get('language', 'unknown'))
 
-    def _get_language_mapping(self, all_blocks: List[Dict[str, Any]]) -> Dict[str, int]:
-        unique_langs = sorted(list(set(b.get('language', 'unknown') for b in all_blocks)))
-        return {lang_name: i for i, lang_name in enumerate(unique_langs)}
+        median_font = np.median(np.asarray(doc_font_sizes, dtype=np.float64)) if doc_font_sizes else 12.0
+        font_map = {font_name: i for i, font_name in enumerate(sorted(unique_fonts))}
+        lang_map = {lang_name: i for i, lang_name in enumerate(sorted(unique_langs))}
+        return median_font, font_map, lang_map
 
     def extract_features(self, all_blocks: List[Dict[str, Any]]) -> Tuple[np.ndarray, Dict[str, int]]:
         if not all_blocks: return np.array([]), {}
         
         # No more slow embedding generation!
         
-        doc_font_sizes = [b.get('font_size', 0) for b in all_blocks if b.get('font_size', 0) > 6]
-        median_font = np.median(doc_font_sizes) if doc_font_sizes else 12.0
-        font_map = self._get_font_mapping(all_blocks)
-        lang_map = self._get_language_mapping(all_blocks)
+        median_font, font_map, lang_map = self._get_document_stats(all_blocks)
         
         heading_context = []
         last_heading_info = {'index': -1, 'level': 0, 'font_size': median_font}
@@ -57,7 +64,13 @@ class FeatureExtractorLite:
         # The returned lang_map isn't strictly needed for the bundle, but we keep it here.
         return np.array(features_matrix, dtype=np.float32), font_map
 
+    # The last three features describe the preceding heading and are the only ones that depend on other blocks' labels.
+    NUM_CONTEXT_FEATURES = 3
+
     def _get_block_features(self, block: Dict[str, Any], index: int, median_font: float, font_map: Dict[str, int], lang_map: Dict[str, int], context: Dict) -> List[float]:
+        return self._get_static_features(block, median_font, font_map, lang_map) + self._get_context_features(block, index, median_font, context)
+
+    def _get_static_features(self, block: Dict[str, Any], median_font: float, font_map: Dict[str, int], lang_map: Dict[str, int]) -> List[float]:
         text = block.get('text', '')
         font_size = block.get('font_size', 0)
         is_bold = float(block.get('is_bold', False))
@@ -66,10 +79,6 @@ class FeatureExtractorLite:
         bbox = block.get('bbox', {'x0': 0, 'y0': 0, 'x1': 0, 'y1': 0})
         page_width = block.get('page_width', 612.0)
         relative_size = font_size / median_font if median_font > 0 else 1.0
-        last_heading_level = float(context['level'])
-        distance_from_last_heading = float(index - context['index']) if context['index'] != -1 else 100.0
-        last_heading_font_size = context['font_size'] if context['font_size'] > 0 else median_font
-        font_size_vs_last_heading = font_size / last_heading_font_size if last_heading_font_size > 0 else 1.0
         language_code = block.get('language', 'unknown')
         language_id = float(lang_map.get(language_code, -1.0))
 
@@ -84,8 +93,15 @@ class FeatureExtractorLite:
             block.get('vertical_space_before', 50.0) / font_size if font_size > 0 else 5.0,
             block.get('vertical_space_after', 50.0) / font_size if font_size > 0 else 5.0,
             float(block.get('line_count', 1)), float(block.get('char_count', 0)),
-            float(text.strip().endswith((':', '.', '。', '：', '!', '?'))), language_id,
-            last_heading_level, distance_from_last_heading, font_size_vs_last_heading
+            float(text.strip().endswith((':', '.', '。', '：', '!', '?'))), language_id
         ]
         
-        return manual_features
\ No newline at end of file
+        return manual_features
+
+    def _get_context_features(self, block: Dict[str, Any], index: int, median_font: float, context: Dict) -> List[float]:
+        font_size = block.get('font_size', 0)
+        last_heading_level = float(context['level'])
+        distance_from_last_heading = float(index - context['index']) if context['index'] != -1 else 100.0
+        last_heading_font_size = context['font_size'] if context['font_size'] > 0 else median_font
+        font_size_vs_last_heading = font_size / last_heading_font_size if last_heading_font_size > 0 else 1.0
+        return [last_heading_level, distance_from_last_heading, font_size_vs_last_heading]
@@ -2,12 +2,20 @@
 
 import fitz # PyMuPDF
 import re
+import threading
 from typing import List, Dict, Any
 from langdetect import detect, lang_detect_exception
 
 # This is necessary for consistent results with langdetect
 from langdetect import DetectorFactory
+from langdetect.detector_factory import init_factory
 DetectorFactory.seed = 0
+# Load the language profiles now, on import: langdetect loads them lazily on first use,
+# which is not safe when several threads detect at once.
+init_factory()
+
+# MuPDF is not thread-safe, so only one thread may parse a PDF at a time.
+_FITZ_LOCK = threading.Lock()
 
 class PdfExtractor:
     """
@@ -20,17 +28,18 @@ class PdfExtractor:
         pass
 
     def extract_enriched_blocks(self, pdf_path: str) -> List[Dict[str, Any]]:
-        doc = fitz.open(pdf_path)
         all_blocks_data = []
-        for page_num, page in enumerate(doc, 1):
-            # Since YOLO is removed, we no longer detect tables here.
-            blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_WHITESPACE)["blocks"]
-            sorted_blocks = sorted(blocks, key=lambda b: (b['bbox'][1], b['bbox'][0]))
-            for block in sorted_blocks:
-                if block.get('type') == 0 and block.get('lines'):
-                    processed_block = self._process_block(block, page, page_num)
-                    if processed_block and processed_block['text']:
-                        all_blocks_data.append(processed_block)
+        with _FITZ_LOCK:
+            doc = fitz.open(pdf_path)
+            for page_num, page in enumerate(doc, 1):
+                # Since YOLO is removed, we no longer detect tables here.
+                blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_WHITESPACE)["blocks"]
+                sorted_blocks = sorted(blocks, key=lambda b: (b['bbox'][1], b['bbox'][0]))
+                for block in sorted_blocks:
+                    if block.get('type') == 0 and block.get('lines'):
+                        processed_block = self._process_block(block, page, page_num)
+                        if processed_block and processed_block['text']:
+                            all_blocks_data.append(processed_block)
         return self._post_process_spacing(all_blocks_data)
 
     def _process_block(self, block: Dict, page: fitz.Page, page_num: int) -> Dict:
@@ -0,0 +1,97 @@
+# Filename: utils/score_blocks.py (HEADING SCORE KERNEL)
+
+import os
+import numpy as np
+
+# The rules run as NumPy array operations by default. Setting PDF_OUTLINE_USE_NUMBA=1
+# compiles the loop version below with Numba instead. On a 500-block document the
+# NumPy version takes ~27 us per call and the compiled loop ~2.5 us, but compiling
+# costs ~0.5 s (plus ~0.2 s to import Numba) in every new process without a warm
+# Numba cache, e.g. each `docker run --rm` and each loky worker. So Numba only pays
+# off for long-running processes with very large documents.
+USE_NUMBA = os.environ.get('PDF_OUTLINE_USE_NUMBA', '') == '1'
+
+
+def _score_block_labels_loop(font_size, is_bold, space_before, text_len, ends_punct, page_number, is_h2_numbered,
+                             rejected, predicted, is_heading_code, size_thresholds, none_code, title_code, h1_code, h2_code, out):
+    for i in range(font_size.shape[0]):
+        if rejected[i]:
+            out[i] = none_code
+            continue
+
+        # --- HEADING SCORING SYSTEM ---
+        heading_score = 0
+        if is_bold[i]: heading_score += 2
+        if font_size[i] > size_thresholds[2]: heading_score += 3
+        elif font_size[i] > size_thresholds[1]: heading_score += 2
+        if space_before[i] > font_size[i] * 1.5: heading_score += 2
+        if text_len[i] > 150: heading_score -= 3
+        if ends_punct[i]: heading_score -= 2
+
+        # --- DECISION LOGIC ---
+        label = predicted[i]
+        if is_heading_code[label] and heading_score < 1:
+            out[i] = none_code
+        elif label == none_code and heading_score >= 4:
+            out[i] = h2_code if is_h2_numbered[i] else h1_code
+        # Rule: A TITLE can ONLY be on page 1.
+        elif label == title_code and page_number[i] != 1:
+            out[i] = h1_code
+        else:
+            out[i] = label
+
+
+def _score_block_labels_numpy(font_size, is_bold, space_before, text_len, ends_punct, page_number, is_h2_numbered,
+                              rejected, predicted, is_heading_code, size_thresholds, none_code, title_code, h1_code, h2_code, out):
+    heading_score = np.where(is_bold, 2, 0)
+    heading_score += np.where(font_size > size_thresholds[2], 3, np.where(font_size > size_thresholds[1], 2, 0))
+    heading_score += np.where(space_before > font_size * 1.5, 2, 0)
+    heading_score -= np.where(text_len > 150, 3, 0)
+    heading_score -= np.where(ends_punct, 2, 0)
+
+    out[:] = predicted
+    # The three decision rules apply to disjoint predicted labels; the rejected mask is applied last so it always wins.
+    out[(predicted == title_code) & (page_number != 1)] = h1_code
+    promote = (predicted == none_code) & (heading_score >= 4)
+    out[promote] = np.where(is_h2_numbered[promote], h2_code, h1_code)
+    out[is_heading_code[predicted] & (heading_score < 1)] = none_code
+    out[rejected] = none_code
+
+
+_score_block_labels = _score_block_labels_numpy
+if USE_NUMBA:
+    from numba import njit
+    # Compiled without `parallel=True`: a document has at most a few thousand blocks, PDFs are
+    # already processed in parallel, and Numba's default threading layer must not be entered
+    # from several threads at once (process_all_pdfs --threads).
+    _score_block_labels = njit(cache=True)(_score_block_labels_loop)
+
+
+def score_block_labels(block_arrays, rejected, predicted, label_codes, size_thresholds, start=0):
+    """
+    Applies the heading-score rules to blocks[start:] at once and returns their final label codes.
+    `predicted` holds the model's label codes for those blocks, `label_codes` maps label names to codes
+    and `size_thresholds` is (1.1, 1.15, 1.25) x median_font. Blocks flagged in `rejected` become NONE.
+    """
+    none_code = label_codes['NONE']
+    num_codes = max(label_codes.values()) + 1
+    is_heading_code = np.zeros(num_codes, dtype=np.bool_)
+    known_codes = np.full(num_codes, none_code, dtype=np.int64)
+    for name, code in label_codes.items():
+        is_heading_code[code] = name.startswith('H')
+        known_codes[code] = code
+
+    # Anything the model predicts outside the known codes counts as NONE
+    predicted = np.asarray(predicted).astype(np.int64)
+    in_range = (predicted >= 0) & (predicted < num_codes)
+    predicted = np.where(in_range, known_codes[np.where(in_range, predicted, 0)], none_code)
+
+    out = np.empty(predicted.shape[0], dtype=np.int64)
+    _score_block_labels(
+        block_arrays['font_size'][start:], block_arrays['is_bold'][start:], block_arrays['space_before'][start:],
+        block_arrays['text_len'][start:], block_arrays['ends_punct'][start:], block_arrays['page_number'][start:],
+        block_arrays['is_h2_numbered'][start:], rejected[start:], predicted, is_heading_code,
+        np.asarray(size_thresholds, dtype=np.float64), none_code, label_codes.get('TITLE', -1),
+        label_codes['H1'], label_codes['H2'], out
+    )
+    return out